@@ -1,7 +1,227 @@
 import pandas as pd
 import numpy as np
 
-def find_optimal_lead_lag(df, max_shift):
+try:
+    import numba
+except ImportError:  # Optional accelerator; the NumPy prefix-sum path is used without it
+    numba = None
+
+def _lagged_cross_products(leading, target, shifts):
+    """
+    Returns sum(leading[i - s] * target[i]) over the overlap for each shift s,
+    computed for all lags at once with a zero-padded FFT cross-correlation.
+    Shifts with no overlap get 0.
+    """
+    n = len(target)
+    out = np.zeros(len(shifts), dtype=np.float64)
+    if n == 0:
+        return out
+
+    # Pad to a power of two of at least 2n - 1 so the circular correlation has no wrap-around
+    fft_len = 1 << (2 * n - 2).bit_length()
+    ccf = np.fft.irfft(np.fft.rfft(target, fft_len) * np.conj(np.fft.rfft(leading, fft_len)), fft_len)
+
+    # Lag s lives at index s for s >= 0 and at fft_len + s for s < 0
+    valid = np.abs(shifts) < n
+    out[valid] = ccf[shifts[valid] % fft_len]
+    return out
+
+def _shift_array(values, shift):
+    """Positional shift of a 1-D array with NaN padding, equivalent to pd.Series.shift."""
+    n = len(values)
+    out = np.full(n, np.nan)
+    if abs(shift) >= n:
+        return out
+    if shift >= 0:
+        out[shift:] = values[:n - shift]
+    else:
+        out[:n + shift] = values[-shift:]
+    return out
+
+def prepare_lag_data(df, leading_col='Leading', target_col='Target'):
+    """
+    Extracts the leading and target columns once as float64 arrays so that the
+    lead/lag, rolling and cumulative analyses of the same DataFrame can share them.
+
+    Args:
+        df (pd.DataFrame): DataFrame with leading and target columns, DatetimeIndex.
+        leading_col (str): Name of the leading column.
+        target_col (str): Name of the target column.
+
+    Returns:
+        dict: 'index', 'leading' and 'target', plus a 'shifted' dict that caches the
+              shifted leading arrays by shift as the analyses request them.
+    """
+    return {
+        'index': df.index,
+        'leading': df[leading_col].to_numpy(dtype=np.float64),
+        'target': df[target_col].to_numpy(dtype=np.float64),
+        'shifted': {},
+    }
+
+def _shifted_leading(lag_data, shift):
+    """Returns the leading series shifted by `shift`, computing it at most once per lag_data."""
+    cache = lag_data['shifted']
+    if shift not in cache:
+        cache[shift] = _shift_array(lag_data['leading'], shift)
+    return cache[shift]
+
+def _windowed_corr(x, y, window, min_periods):
+    """
+    Pearson correlation of x and y over a trailing window ending at each position,
+    using only pairs where both values are present (like pandas rolling().corr()).
+
+    Window sums are taken as differences of prefix sums, so each call is O(N)
+    regardless of the window size. Positions with fewer than min_periods valid
+    pairs, or with zero variance, are NaN.
+    """
+    n = len(x)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    count = valid.astype(np.float64)
+    # Centre on the valid pairs so the moment differences stay well-conditioned
+    x0 = np.where(valid, x, 0.0)
+    y0 = np.where(valid, y, 0.0)
+    if valid.any():
+        x0 = np.where(valid, x0 - x0[valid].mean(), 0.0)
+        y0 = np.where(valid, y0 - y0[valid].mean(), 0.0)
+
+    end = np.arange(1, n + 1)
+    start = np.clip(end - window, 0, None)
+
+    def prefix_sum(values):
+        return np.concatenate(([0.0], np.cumsum(values)))
+
+    c_n, c_x, c_y = prefix_sum(count), prefix_sum(x0), prefix_sum(y0)
+    c_xx, c_yy, c_xy = prefix_sum(x0 * x0), prefix_sum(y0 * y0), prefix_sum(x0 * y0)
+
+    n_w = c_n[end] - c_n[start]
+    sum_x = c_x[end] - c_x[start]
+    sum_y = c_y[end] - c_y[start]
+    sum_xy = c_xy[end] - c_xy[start]
+    var_x = n_w * (c_xx[end] - c_xx[start]) - sum_x ** 2
+    var_y = n_w * (c_yy[end] - c_yy[start]) - sum_y ** 2
+
+    # Differencing prefix sums leaves rounding noise proportional to the running
+    # total, so a flat window can show a tiny non-zero variance; treat it as zero.
+    noise_floor = 64 * np.finfo(np.float64).eps * n_w
+    degenerate = (var_x <= noise_floor * c_xx[end]) | (var_y <= noise_floor * c_yy[end])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = (n_w * sum_xy - sum_x * sum_y) / np.sqrt(var_x * var_y)
+    corr[(n_w < max(min_periods, 2)) | degenerate] = np.nan
+    return corr
+
+def _rolling_corr_kernel(x, y, max_shift, window, min_periods):
+    """
+    Rolling Pearson correlation of y against x shifted by every s in -max_shift..max_shift,
+    in one streaming pass per shift. Pairs enter and leave the window through
+    Welford-style add/remove updates of the means and co-moments. Returns an
+    (n, 2*max_shift+1) array; column k holds shift k - max_shift.
+
+    Removals leave rounding residue of the order of eps times the squares that have
+    passed through the window, which can pose as variance once the window goes flat.
+    When a window's spread falls to that level its moments are recomputed exactly
+    from its own pairs, and a spread that is still within rounding of the window's
+    own magnitude is treated as zero variance (NaN), as in _windowed_corr.
+    """
+    n = len(y)
+    n_shifts = 2 * max_shift + 1
+    out = np.full((n, n_shifts), np.nan)
+    min_count = max(min_periods, 2)
+    noise = 64 * np.finfo(np.float64).eps
+
+    # Centre on the series means so a level offset does not swamp the window moments
+    x = x - np.nanmean(x)
+    y = y - np.nanmean(y)
+
+    for k in numba.prange(n_shifts):
+        s = k - max_shift
+        count = 0
+        mean_x = 0.0
+        mean_y = 0.0
+        m2_x = 0.0
+        m2_y = 0.0
+        c_xy = 0.0
+        # Sum of squares of every value added or removed since the moments were last
+        # computed from scratch; bounds the rounding residue in m2_x / m2_y
+        mag_x = 0.0
+        mag_y = 0.0
+        # Add-only Welford updates are accurate, so residue can only exist after a
+        # removal; without this an expanding window (window >= n) that starts flat
+        # would be recomputed from scratch on every row
+        removed = False
+        # Removals after the last output row cannot change any output, so stop at n
+        for i in range(n):
+            # Pair entering the window at position i
+            if 0 <= i - s < n:
+                xi = x[i - s]
+                yi = y[i]
+                if not (np.isnan(xi) or np.isnan(yi)):
+                    count += 1
+                    dx = xi - mean_x
+                    mean_x += dx / count
+                    dy = yi - mean_y
+                    mean_y += dy / count
+                    m2_x += dx * (xi - mean_x)
+                    m2_y += dy * (yi - mean_y)
+                    c_xy += dx * (yi - mean_y)
+                    mag_x += xi * xi
+                    mag_y += yi * yi
+            # Pair leaving the window once it is `window` positions behind
+            j = i - window
+            if j >= 0 and 0 <= j - s < n:
+                xj = x[j - s]
+                yj = y[j]
+                if not (np.isnan(xj) or np.isnan(yj)):
+                    count -= 1
+                    if count == 0:
+                        mean_x = mean_y = m2_x = m2_y = c_xy = mag_x = mag_y = 0.0
+                        removed = False
+                    else:
+                        removed = True
+                        dx = xj - mean_x
+                        mean_x -= dx / count
+                        dy = yj - mean_y
+                        mean_y -= dy / count
+                        m2_x -= dx * (xj - mean_x)
+                        m2_y -= dy * (yj - mean_y)
+                        c_xy -= dx * (yj - mean_y)
+                        mag_x += xj * xj
+                        mag_y += yj * yj
+            if count >= min_count:
+                if removed and not (m2_x > noise * mag_x and m2_y > noise * mag_y):
+                    # Spread is within the possible residue: recompute the window exactly
+                    lo = max(0, i - window + 1, s)
+                    hi = min(i + 1, n + s)
+                    sum_x = 0.0
+                    sum_y = 0.0
+                    for t in range(lo, hi):
+                        if not (np.isnan(x[t - s]) or np.isnan(y[t])):
+                            sum_x += x[t - s]
+                            sum_y += y[t]
+                    mean_x = sum_x / count
+                    mean_y = sum_y / count
+                    m2_x = m2_y = c_xy = mag_x = mag_y = 0.0
+                    for t in range(lo, hi):
+                        if not (np.isnan(x[t - s]) or np.isnan(y[t])):
+                            dx = x[t - s] - mean_x
+                            dy = y[t] - mean_y
+                            m2_x += dx * dx
+                            m2_y += dy * dy
+                            c_xy += dx * dy
+                            mag_x += x[t - s] * x[t - s]
+                            mag_y += y[t] * y[t]
+                    removed = False
+                if m2_x > noise * mag_x and m2_y > noise * mag_y:
+                    out[i, k] = c_xy / np.sqrt(m2_x * m2_y)
+    return out
+
+if numba is not None:
+    _rolling_corr_all_shifts = numba.njit(parallel=True, cache=True)(_rolling_corr_kernel)
+else:
+    _rolling_corr_all_shifts = None
+
+def find_optimal_lead_lag(df, max_shift, lag_data=None):
     """
     Calculates R-squared for different lead/lag shifts of the 'Leading' series
     against the 'Target' series and finds the optimal shift.
@@ -10,6 +230,7 @@ def find_optimal_lead_lag(df, max_shift):
         df (pd.DataFrame): DataFrame with 'Leading' and 'Target' columns,
                            and a DatetimeIndex.
         max_shift (int): The maximum number of periods to shift (e.g., 12 for -12 to +12).
+        lag_data (dict, optional): Arrays from prepare_lag_data(df), reused if given.
 
     Returns:
         tuple: (best_shift (int), r2_results (pd.DataFrame))
@@ -17,42 +238,85 @@ def find_optimal_lead_lag(df, max_shift):
                r2_results: DataFrame with columns ['Shift', 'R_Squared'].
                Returns (None, None) if calculation fails.
     """
-    results = []
-    target_series = df['Target']
-    leading_series = df['Leading']
+    if lag_data is None:
+        lag_data = prepare_lag_data(df)
+    target = lag_data['target']
+    leading = lag_data['leading']
+    n = len(target)
 
-    shifts_to_test = range(-max_shift, max_shift + 1)
+    shifts = np.arange(-max_shift, max_shift + 1)
 
     print(f"\n--- Lead/Lag Analysis (Step 4) ---")
-    print(f"Testing shifts from {min(shifts_to_test)} to {max(shifts_to_test)}...")
-
-    for shift in shifts_to_test:
-        shifted_leading = leading_series.shift(shift)
-        temp_df = pd.DataFrame({'Target': target_series, 'Shifted_Leading': shifted_leading}).dropna()
-
-        if len(temp_df) < 2:
-            r_squared = np.nan
-        else:
-            correlation = temp_df['Shifted_Leading'].corr(temp_df['Target'])
-            r_squared = correlation ** 2
-
-        results.append({'Shift': shift, 'R_Squared': r_squared})
-
-    r2_results_df = pd.DataFrame(results)
-
-    if r2_results_df['R_Squared'].isnull().all():
+    print(f"Testing shifts from {shifts[0]} to {shifts[-1]}...")
+
+    # Centre both series on their present values so the moment differences below stay
+    # well-conditioned (Pearson r is unaffected by a constant offset).
+    valid_x = ~np.isnan(leading)
+    valid_y = ~np.isnan(target)
+    if valid_x.any():
+        leading = leading - leading[valid_x].mean()
+    if valid_y.any():
+        target = target - target[valid_y].mean()
+
+    # Shifting the leading series by s pairs leading[i - s] with target[i], so the
+    # overlap on the target side starts at max(0, s) and holds n - |s| pairs.
+    n_eff = np.clip(n - np.abs(shifts), 0, None)
+    y_start = np.where(n_eff > 0, np.clip(shifts, 0, None), 0)
+    y_end = y_start + n_eff
+    x_start = np.where(n_eff > 0, y_start - shifts, 0)
+    x_end = x_start + n_eff
+
+    if valid_x.all() and valid_y.all():
+        # Prefix sums with a leading zero, so the sum over [a, b) is c[b] - c[a]
+        cx = np.concatenate(([0.0], np.cumsum(leading)))
+        cxx = np.concatenate(([0.0], np.cumsum(leading * leading)))
+        cy = np.concatenate(([0.0], np.cumsum(target)))
+        cyy = np.concatenate(([0.0], np.cumsum(target * target)))
+
+        sum_x = cx[x_end] - cx[x_start]
+        sum_xx = cxx[x_end] - cxx[x_start]
+        sum_y = cy[y_end] - cy[y_start]
+        sum_yy = cyy[y_end] - cyy[y_start]
+        # The cross term depends on the shift itself, so it cannot come from a shared
+        # prefix sum; read it off an FFT cross-correlation covering every lag at once.
+        sum_xy = _lagged_cross_products(leading, target, shifts)
+    else:
+        # A missing value drops its pair from the overlap (as a per-shift dropna would),
+        # and which pairs survive depends on the shift, so sum each overlap directly
+        n_eff = np.zeros(len(shifts), dtype=np.int64)
+        sum_x, sum_xx, sum_y, sum_yy, sum_xy = (np.zeros(len(shifts)) for _ in range(5))
+        for k in range(len(shifts)):
+            x = leading[x_start[k]:x_end[k]]
+            y = target[y_start[k]:y_end[k]]
+            pairs = valid_x[x_start[k]:x_end[k]] & valid_y[y_start[k]:y_end[k]]
+            x, y = x[pairs], y[pairs]
+            n_eff[k] = x.size
+            sum_x[k], sum_xx[k] = x.sum(), x @ x
+            sum_y[k], sum_yy[k] = y.sum(), y @ y
+            sum_xy[k] = x @ y
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        numerator = n_eff * sum_xy - sum_x * sum_y
+        denominator = np.sqrt((n_eff * sum_xx - sum_x ** 2) * (n_eff * sum_yy - sum_y ** 2))
+        correlation = numerator / denominator
+    correlation[(n_eff < 2) | ~(denominator > 0)] = np.nan
+    r_squared = correlation ** 2
+
+    r2_results_df = pd.DataFrame({'Shift': shifts, 'R_Squared': r_squared})
+
+    if np.isnan(r_squared).all():
         print("Warning: Could not calculate R-squared for any shift. Not enough overlapping data.")
         return None, r2_results_df
 
-    best_result = r2_results_df.loc[r2_results_df['R_Squared'].idxmax()]
-    best_shift = int(best_result['Shift'])
+    best_idx = int(np.nanargmax(r_squared))
+    best_shift = int(shifts[best_idx])
 
-    print(f"Optimal Shift Found: {best_shift} periods (R-Squared: {best_result['R_Squared']:.4f})")
+    print(f"Optimal Shift Found: {best_shift} periods (R-Squared: {r_squared[best_idx]:.4f})")
 
     return best_shift, r2_results_df
 
 # --- Rolling Correlation Function ---
-def calculate_rolling_correlations(df, max_shift, window, leading_col='Leading', target_col='Target'):
+def calculate_rolling_correlations(df, max_shift, window, leading_col='Leading', target_col='Target', lag_data=None):
     """
     Calculates rolling correlations for different lead/lag shifts.
 
@@ -62,6 +326,7 @@ def calculate_rolling_correlations(df, max_shift, window, leading_col='Leading',
         window (int): The rolling window size for the correlation calculation.
         leading_col (str): Name of the leading column.
         target_col (str): Name of the target column.
+        lag_data (dict, optional): Arrays from prepare_lag_data(df), reused if given.
 
     Returns:
         pd.DataFrame: A DataFrame where index is date, columns are shift periods,
@@ -77,40 +342,32 @@ def calculate_rolling_correlations(df, max_shift, window, leading_col='Leading',
         print("Error: Input DataFrame is empty.")
         return None
 
-    target_series = df[target_col]
-    leading_series = df[leading_col]
-    rolling_corr_results = {} # Dictionary to store series for each shift
-
+    if lag_data is None:
+        lag_data = prepare_lag_data(df, leading_col, target_col)
+    target = lag_data['target']
+    leading = lag_data['leading']
     shifts_to_test = range(-max_shift, max_shift + 1)
+    min_periods_required = int(window * 0.9) # Require at least 90% of window to have data
 
-    for shift in shifts_to_test:
-        shifted_leading = leading_series.shift(shift)
+    if _rolling_corr_all_shifts is not None:
+        # Single compiled pass over the data, parallel across shifts
+        all_corrs = _rolling_corr_all_shifts(leading, target, max_shift, window, min_periods_required)
+    else:
+        # One column per shift, written in place; every shift shares the same index
+        all_corrs = np.empty((len(target), len(shifts_to_test)), dtype=np.float64)
+        for k, shift in enumerate(shifts_to_test):
+            shifted_leading = _shifted_leading(lag_data, shift)
 
-        # Calculate rolling correlation between target and shifted leading series
-        min_periods_required = int(window * 0.9) # Require at least 90% of window to have data
-        rolling_corr = shifted_leading.rolling(window=window, min_periods=min_periods_required).corr(target_series)
+            # Rolling correlation between target and shifted leading series from windowed moment sums
+            all_corrs[:, k] = _windowed_corr(shifted_leading, target, window, min_periods_required)
 
-        # Store the resulting series, naming it by the shift
-        rolling_corr_results[f'Shift_{shift}'] = rolling_corr
-
-        # Optional progress print
-        # if shift % 5 == 0:
-        #     print(f"  Calculated rolling correlation for shift {shift}")
-
-    # Combine all resulting series into a single DataFrame
-    try:
-        rolling_corr_df = pd.DataFrame(rolling_corr_results)
-        print(f"Rolling correlations calculated. Shape: {rolling_corr_df.shape}")
-        # Optional: Print head/tail to check
-        # print(rolling_corr_df.dropna().head())
-    except Exception as e:
-        print(f"Error combining rolling correlation results into DataFrame: {e}")
-        return None
+    rolling_corr_df = pd.DataFrame(all_corrs, index=df.index, columns=[f'Shift_{shift}' for shift in shifts_to_test])
+    print(f"Rolling correlations calculated. Shape: {rolling_corr_df.shape}")
 
     return rolling_corr_df
 
 # --- NEW: Cumulative Correlation Function ---
-def calculate_cumulative_correlations(df, max_shift, leading_col='Leading', target_col='Target'):
+def calculate_cumulative_correlations(df, max_shift, leading_col='Leading', target_col='Target', lag_data=None):
     """
     Calculates cumulative (expanding) correlations for different lead/lag shifts.
 
@@ -119,6 +376,7 @@ def calculate_cumulative_correlations(df, max_shift, leading_col='Leading', targ
         max_shift (int): The maximum number of periods to shift (-max_shift to +max_shift).
         leading_col (str): Name of the leading column.
         target_col (str): Name of the target column.
+        lag_data (dict, optional): Arrays from prepare_lag_data(df), reused if given.
 
     Returns:
         pd.DataFrame: A DataFrame where index is date, columns are shift periods (e.g., CumCorr_Shift_1),
@@ -131,31 +389,28 @@ def calculate_cumulative_correlations(df, max_shift, leading_col='Leading', targ
         print("Error: Input DataFrame is empty.")
         return None
 
-    target_series = df[target_col]
-    leading_series = df[leading_col]
-    cumulative_corr_results = {} # Dictionary to store series for each shift
-
+    if lag_data is None:
+        lag_data = prepare_lag_data(df, leading_col, target_col)
+    target = lag_data['target']
+    leading = lag_data['leading']
     shifts_to_test = range(-max_shift, max_shift + 1)
 
     # Define a minimum number of periods required for the expanding calculation
     # Start calculating correlation once we have at least 2 pairs of non-NA data
     min_periods_required = 2
 
-    for shift in shifts_to_test:
-        shifted_leading = leading_series.shift(shift)
-
-        # Calculate expanding correlation between target and shifted leading series
-        cumulative_corr = shifted_leading.expanding(min_periods=min_periods_required).corr(target_series)
-
-        # Store the resulting series, naming it clearly
-        cumulative_corr_results[f'CumCorr_Shift_{shift}'] = cumulative_corr
-
-    # Combine all resulting series into a single DataFrame
-    try:
-        cumulative_corr_df = pd.DataFrame(cumulative_corr_results)
-        print(f"Cumulative correlations calculated. Shape: {cumulative_corr_df.shape}")
-    except Exception as e:
-        print(f"Error combining cumulative correlation results into DataFrame: {e}")
-        return None
+    # Expanding correlation: a window spanning the whole series always starts at row 0
+    if _rolling_corr_all_shifts is not None:
+        # Same compiled kernel as the rolling case; with window = n nothing ever leaves
+        all_corrs = _rolling_corr_all_shifts(leading, target, max_shift, len(target), min_periods_required)
+    else:
+        # One column per shift, written in place; every shift shares the same index
+        all_corrs = np.empty((len(target), len(shifts_to_test)), dtype=np.float64)
+        for k, shift in enumerate(shifts_to_test):
+            shifted_leading = _shifted_leading(lag_data, shift)
+            all_corrs[:, k] = _windowed_corr(shifted_leading, target, len(target), min_periods_required)
+
+    cumulative_corr_df = pd.DataFrame(all_corrs, index=df.index, columns=[f'CumCorr_Shift_{shift}' for shift in shifts_to_test])
+    print(f"Cumulative correlations calculated. Shape: {cumulative_corr_df.shape}")
 
     return cumulative_corr_df
@@ -1,6 +1,89 @@
+import functools
+import hashlib
+import importlib.util
+import os
+import numpy as np
 import pandas as pd
 
-def load_data(file_path, date_col, leading_col, target_col, header_row=0, sheet_name=0):
+try:
+    import python_calamine  # noqa: F401 -- Rust-backed reader used via pandas' 'calamine' engine
+    _HAS_CALAMINE = True
+except ImportError:
+    _HAS_CALAMINE = False
+
+# Parquet engine for the on-disk cache of loaded data (optional; caching is skipped without it)
+_HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+# Parquet schema metadata key recording the workbook's mtime and size when the cache was built
+_CACHE_SOURCE_KEY = b'regression_project.source_stat'
+
+# Formats tried in order for text date columns. ISO8601 is pandas' vectorized fast path;
+# 'mm/yy' is tried before the generic 'mixed' parser, which would otherwise read
+# e.g. '01/95' as a full date with an arbitrary day.
+_DATE_FORMATS = (
+    ('ISO8601', None),
+    ('%m/%y', "Info: Interpreted date column using 'mm/yy' format."),
+    ('mixed', None),
+)
+
+def _parse_dates(dates, date_format=None):
+    """
+    Parses a date column in a single pass where possible.
+
+    Args:
+        dates (pd.Series): Raw date column as read from Excel.
+        date_format (str, optional): Explicit strftime format for text dates. When
+                                     given it is the only format tried.
+
+    Returns:
+        pd.Series: Parsed datetime64 values, or None if no known format applies.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates # Engine already produced real dates
+    if date_format is not None:
+        try:
+            return pd.to_datetime(dates, format=date_format)
+        except (ValueError, TypeError):
+            return None
+    if pd.api.types.is_numeric_dtype(dates):
+        # Excel serial day numbers (1900 date system)
+        return pd.to_datetime(dates, unit='D', origin='1899-12-30')
+
+    for date_format, message in _DATE_FORMATS:
+        try:
+            parsed = pd.to_datetime(dates, format=date_format)
+        except (ValueError, TypeError):
+            continue
+        if message:
+            print(message)
+        return parsed
+    return None
+
+@functools.lru_cache(maxsize=8)
+def _read_sheet_cached(file_path, mtime_ns, engine, sheet_name, header_row, columns):
+    """
+    Reads the requested columns of a sheet, memoized across calls.
+
+    The file's modification time is part of the key, so an edited workbook is
+    re-read; call _read_sheet_cached.cache_clear() to drop cached frames explicitly.
+    Callers must treat the returned DataFrame as read-only.
+
+    Args:
+        file_path (str): Path to the Excel file.
+        mtime_ns (int): Modification time of the file in nanoseconds.
+        engine (str): pandas read_excel engine.
+        sheet_name (str or int): Name or 0-indexed position of the sheet to read.
+        header_row (int): The 0-indexed row number containing the headers.
+        columns (tuple): Column names to materialize.
+
+    Returns:
+        pandas.DataFrame: The raw (unparsed) columns that exist in the sheet.
+    """
+    # A callable keeps missing names from raising here; they are reported by the caller
+    return pd.read_excel(file_path, engine=engine, header=header_row, sheet_name=sheet_name,
+                         usecols=lambda col: col in columns)
+
+def load_data(file_path, date_col, leading_col, target_col, header_row=0, sheet_name=0, date_format=None):
     """
     Loads data from a specific sheet in an Excel file, selects specified columns,
     parses dates, and handles missing values.
@@ -12,6 +95,8 @@ def load_data(file_path, date_col, leading_col, target_col, header_row=0, sheet_
         target_col (str): Name of the target series column.
         header_row (int): The 0-indexed row number containing the headers.
         sheet_name (str or int): Name or 0-indexed position of the sheet to read.
+        date_format (str, optional): Explicit format of the date column (e.g. '%m/%y').
+                                     Skips format inference when given.
 
     Returns:
         pandas.DataFrame: Processed DataFrame with selected columns,
@@ -19,60 +104,54 @@ def load_data(file_path, date_col, leading_col, target_col, header_row=0, sheet_
     """
     try:
         # Determine the engine based on file extension
-        if file_path.endswith('.xlsx'):
-            engine = 'openpyxl'
-        elif file_path.endswith('.xls'):
-            engine = 'xlrd' # Note: xlrd might be needed for .xls
-        else:
+        if not file_path.endswith(('.xlsx', '.xls')):
             print(f"Error: Unsupported file format for {file_path}. Please use .xlsx or .xls.")
             return None
+        if _HAS_CALAMINE:
+            engine = 'calamine' # Native parser for both .xlsx and .xls, much faster than openpyxl
+        elif file_path.endswith('.xlsx'):
+            engine = 'openpyxl'
+        else:
+            engine = 'xlrd' # Note: xlrd might be needed for .xls
 
-        df = pd.read_excel(file_path, engine=engine, header=header_row, sheet_name=sheet_name)
+        required_cols = [date_col, leading_col, target_col]
+
+        # Only materialize the three columns we use; repeat loads of an unchanged sheet hit the cache
+        df = _read_sheet_cached(file_path, os.stat(file_path).st_mtime_ns, engine,
+                                sheet_name, header_row, tuple(required_cols))
         print(f"Info: Reading sheet '{sheet_name}' with headers from row index {header_row}.")
 
-        required_cols = [date_col, leading_col, target_col]
         missing_cols = [col for col in required_cols if col not in df.columns]
         if missing_cols:
-            print(f"Error: The following columns were not found in sheet '{sheet_name}' (using header row {header_row}): {', '.join(missing_cols)}")
-            print(f"Available columns: {', '.join(df.columns)}")
+            print(f"Error: The following columns were not found in sheet '{sheet_name}' (using header row {header_row}): {', '.join(map(str, missing_cols))}")
+            # Error path only: re-read just the header row to list what the sheet offers
+            available_cols = pd.read_excel(file_path, engine=engine, header=header_row, sheet_name=sheet_name, nrows=0).columns
+            print(f"Available columns: {', '.join(map(str, available_cols))}")
             return None
 
-        df = df[required_cols].copy()
-
-        df.rename(columns={
-            date_col: 'Date',
-            leading_col: 'Leading',
-            target_col: 'Target'
-        }, inplace=True)
-
-        try:
-            df['Date'] = pd.to_datetime(df['Date'])
-        except ValueError:
-            try:
-                df['Date'] = pd.to_datetime(df['Date'], format='%m/%y')
-                print("Info: Interpreted date column using 'mm/yy' format.")
-            except ValueError:
-                try:
-                    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
-                    print("Info: Interpreted date column using 'YYYY-MM-DD' format.")
-                except ValueError:
-                    print(f"Error: Could not parse the date column '{date_col}'. Please ensure it's in a recognizable format (e.g., YYYY-MM-DD, MM/DD/YYYY, mm/yy).")
-                    return None
-        except Exception as e:
-            print(f"Error parsing date column '{date_col}': {e}")
+        parsed_dates = _parse_dates(df[date_col], date_format)
+        if parsed_dates is None:
+            if date_format is not None:
+                print(f"Error: Could not parse the date column '{date_col}' using format '{date_format}'.")
+            else:
+                print(f"Error: Could not parse the date column '{date_col}'. Please ensure it's in a recognizable format (e.g., YYYY-MM-DD, MM/DD/YYYY, mm/yy).")
             return None
 
-        df['Leading'] = pd.to_numeric(df['Leading'], errors='coerce')
-        df['Target'] = pd.to_numeric(df['Target'], errors='coerce')
+        # Coerce rather than forcing dtype=float64 at read time: FRED-style sheets mark
+        # gaps with text such as '.' or '#N/A', which should become NaN, not an error
+        dates = parsed_dates.to_numpy()
+        leading = pd.to_numeric(df[leading_col].to_numpy(), errors='coerce')
+        target = pd.to_numeric(df[target_col].to_numpy(), errors='coerce')
 
-        initial_rows = len(df)
-        df.dropna(subset=['Date', 'Leading', 'Target'], inplace=True)
-        dropped_rows = initial_rows - len(df)
+        # One mask over the raw arrays instead of rename/dropna/set_index on the frame
+        valid = ~(pd.isna(dates) | pd.isna(leading) | pd.isna(target))
+        dropped_rows = len(valid) - int(valid.sum())
         if dropped_rows > 0:
             print(f"Info: Dropped {dropped_rows} row(s) due to missing values in Date, Leading, or Target columns.")
 
-        df.sort_values(by='Date', inplace=True)
-        df.set_index('Date', inplace=True) 
+        df = pd.DataFrame({'Leading': leading[valid], 'Target': target[valid]},
+                          index=pd.DatetimeIndex(dates[valid], name='Date'))
+        df.sort_index(inplace=True)
 
         if df.empty:
             print("Error: No valid data remaining after processing and removing missing values.")
@@ -85,7 +164,8 @@ def load_data(file_path, date_col, leading_col, target_col, header_row=0, sheet_
         print(f"Error: File not found at {file_path}")
         return None
     except ValueError as e: 
-         if "Worksheet" in str(e) and "does not exist" in str(e):
+         # Wording differs between engines ("does not exist" vs. "not found")
+         if "Worksheet" in str(e) and ("does not exist" in str(e) or "not found" in str(e)):
               print(f"Error: Sheet name '{sheet_name}' not found in the Excel file.")
               # You might want to list available sheets here if needed
               # excel_file = pd.ExcelFile(file_path, engine=engine)
@@ -96,3 +176,117 @@ def load_data(file_path, date_col, leading_col, target_col, header_row=0, sheet_
     except Exception as e:
         print(f"An unexpected error occurred during data loading: {e}")
         return None
+
+def _cache_path(file_path, sheet_name, header_row, columns, date_format):
+    """
+    Returns the Parquet cache path for one way of loading a workbook.
+
+    Every argument that changes the loaded frame is hashed into the file name, so
+    switching sheet, header row, columns or date format never reuses a stale cache.
+    """
+    key = repr((sheet_name, header_row, columns, date_format)).encode('utf-8')
+    return f"{file_path}.{hashlib.sha1(key).hexdigest()[:12]}.parquet"
+
+def _source_stat(file_path):
+    """
+    Returns the workbook's modification time (ns) and size as the bytes stored in the cache.
+    """
+    st = os.stat(file_path)
+    return f"{st.st_mtime_ns}:{st.st_size}".encode('ascii')
+
+def load_data_cached(file_path, date_col, leading_col, target_col, header_row=0, sheet_name=0, date_format=None):
+    """
+    Same as load_data, but keeps the processed DataFrame in a Parquet file next to
+    the workbook so repeated runs skip parsing the Excel file.
+
+    The cache records the workbook's modification time and size and is used only if
+    both still match exactly, so replacing the workbook with any other file (even an
+    older one) forces a reload. It is rewritten after every fresh load. Without pyarrow
+    this simply calls load_data.
+
+    Args:
+        See load_data.
+
+    Returns:
+        pandas.DataFrame: Processed DataFrame with selected columns,
+                          or None if an error occurs.
+    """
+    if not _HAS_PYARROW:
+        return load_data(file_path, date_col, leading_col, target_col, header_row, sheet_name, date_format)
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    cache_path = _cache_path(file_path, sheet_name, header_row, (date_col, leading_col, target_col), date_format)
+    source_stat = None
+    try:
+        # Taken before reading, so a workbook changed mid-load never matches next time
+        source_stat = _source_stat(file_path)
+        # Only the footer is read to check freshness; the data is read on a match
+        cache_metadata = pq.read_schema(cache_path).metadata or {}
+        if cache_metadata.get(_CACHE_SOURCE_KEY) == source_stat:
+            df = pd.read_parquet(cache_path, engine='pyarrow')
+            print(f"Info: Loaded cached data from {cache_path}. Shape: {df.shape}")
+            return df
+    except OSError:
+        pass # No cache yet, or the workbook is missing (load_data reports that)
+    except Exception as e:
+        print(f"Warning: Could not read data cache {cache_path}: {e}. Reloading from Excel.")
+
+    df = load_data(file_path, date_col, leading_col, target_col, header_row, sheet_name, date_format)
+    if df is not None and source_stat is not None:
+        try:
+            table = pa.Table.from_pandas(df)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), _CACHE_SOURCE_KEY: source_stat})
+            pq.write_table(table, cache_path, compression='zstd')
+        except Exception as e:
+            print(f"Warning: Could not write data cache {cache_path}: {e}")
+    return df
+
+def build_exclusion_mask(index, exclusion_periods):
+    """
+    Builds a boolean mask of the rows falling inside any of the exclusion periods.
+
+    All start and end dates are parsed in one vectorized call each, and the sorted
+    index is searched for every period at once; overlapping periods are fine.
+
+    Args:
+        index (pd.DatetimeIndex): Sorted index of the loaded data.
+        exclusion_periods (list): Period strings in the form 'YYYY-MM-DD:YYYY-MM-DD'.
+
+    Returns:
+        np.ndarray: Boolean mask, True for rows to exclude.
+    """
+    periods, starts_raw, ends_raw = [], [], []
+    for period_str in exclusion_periods:
+        try:
+            start_str, end_str = period_str.split(':')
+        except ValueError:
+            print(f"  Warning: Invalid format for exclusion period '{period_str}'. Expected START:END. Skipping.")
+            continue
+        periods.append(period_str)
+        starts_raw.append(start_str.strip())
+        ends_raw.append(end_str.strip())
+
+    starts = pd.to_datetime(starts_raw, format='mixed', errors='coerce')
+    ends = pd.to_datetime(ends_raw, format='mixed', errors='coerce')
+
+    keep = np.zeros(len(periods), dtype=bool)
+    for i, period_str in enumerate(periods):
+        # Check if dates parsed correctly and start <= end
+        if pd.isna(starts[i]) or pd.isna(ends[i]):
+            print(f"  Warning: Could not parse dates in exclusion period '{period_str}'. Expected format YYYY-MM-DD. Skipping.")
+        elif starts[i] > ends[i]:
+            print(f"  Warning: Start date {starts_raw[i]} is after end date {ends_raw[i]} in exclusion period '{period_str}'. Skipping this period.")
+        else:
+            keep[i] = True
+            print(f"  Marked period {starts_raw[i]} to {ends_raw[i]} for exclusion.")
+
+    # The index is sorted, so each period is one contiguous run of rows [lo, hi).
+    # Mark run starts with +1 and ends with -1; a positive running sum means covered.
+    lo = index.searchsorted(starts[keep], side='left')
+    hi = index.searchsorted(ends[keep], side='right')
+    coverage = np.zeros(len(index) + 1, dtype=np.int64)
+    np.add.at(coverage, lo, 1)
+    np.add.at(coverage, hi, -1)
+    return np.cumsum(coverage[:-1]) > 0
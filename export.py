@@ -1,44 +1,112 @@
+import importlib.util
 import pandas as pd
 import os
 import math
 import numpy as np
 
-# Helper function to apply formatting to correlation sheets
-def _apply_correlation_formatting(worksheet, df, max_shift, bold_format, highlight_format, workbook, apply_bolding=True, apply_highlighting=True):
-    """Applies conditional formatting to a correlation DataFrame in Excel."""
+# Optional: only the Parquet export needs it
+_HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+# Number of trailing dates used to infer the frequency for the extra shifted row
+_FREQ_INFERENCE_TAIL = 24
+
+def _column_shifts(columns):
+    """
+    Extracts the shift number from correlation column names in one vectorized pass.
+
+    Args:
+        columns (pd.Index): Column names like 'Shift_N' or 'CumCorr_Shift_N'.
+
+    Returns:
+        np.ndarray: Float array of shift numbers, NaN where a name carries no shift.
+    """
+    suffixes = pd.Index(columns).astype(str).str.rsplit('_', n=1).str[-1]
+    return pd.to_numeric(pd.Series(suffixes), errors='coerce').to_numpy(dtype=float)
+
+def _best_final_shift(final_corr, shifts, label):
+    """
+    Finds the shift whose correlation is highest in the final row.
+
+    Args:
+        final_corr (pd.Series): Final-row correlations, one per shift column.
+        shifts (np.ndarray): Shift number of each entry of final_corr.
+        label (str): Name of the correlation type, used in the warning.
+
+    Returns:
+        int: The best shift, or None if the final row is empty or all NaN.
+    """
+    last_vals = final_corr.to_numpy(dtype=np.float64)
+    if last_vals.size == 0 or not np.isfinite(last_vals).any():
+        print(f"  - Warning: Final {label} correlations are empty or all NaN. Leaving the {label} best-shift column empty.")
+        return None
+    # Position of the max on the plain array; NaN entries are skipped
+    return int(shifts[int(np.nanargmax(last_vals))])
+
+def _write_frame(worksheet, df, date_format, index=True, column_formats=None):
+    """
+    Writes a numeric DataFrame straight through xlsxwriter, bypassing pandas' per-cell
+    style handling in to_excel. Layout matches to_excel. Cells are written strictly
+    row by row, as xlsxwriter's constant_memory mode requires.
+
+    Args:
+        worksheet (xlsxwriter.worksheet.Worksheet): Empty worksheet to write into.
+        df (pd.DataFrame): Numeric columns; a DatetimeIndex when index is True.
+        date_format (xlsxwriter.format.Format): Number format for the date column.
+        index (bool): Whether to write the index as the first column.
+        column_formats (list, optional): Cell format (or None) per column of df, as returned
+                                         by _apply_correlation_formatting.
+    """
+    if column_formats is None:
+        column_formats = [None] * len(df.columns)
+    first_col = 1 if index else 0
+    header = [df.index.name or '', *map(str, df.columns)] if index else list(map(str, df.columns))
+    worksheet.write_row(0, 0, header)
+
+    if index:
+        # Dates as Excel serial numbers (1900 date system) computed in one vectorized step
+        serials = ((df.index - pd.Timestamp('1899-12-30')) / pd.Timedelta(days=1)).tolist()
+
+    for i, row in enumerate(df.to_numpy(dtype=float).tolist()):
+        if index:
+            worksheet.write_number(i + 1, 0, serials[i], date_format)
+        for j, value in enumerate(row):
+            # NaN cells stay blank (and unformatted), as with to_excel
+            if value == value:
+                worksheet.write_number(i + 1, j + first_col, value, column_formats[j])
+
+# Helper function to work out formatting for correlation sheets
+def _apply_correlation_formatting(worksheet, df, max_shift, bold_format, highlight_format, apply_bolding=True, apply_highlighting=True, column_shifts=None, numeric_cols=None, bold_highlight_format=None):
+    """
+    Determines the cell format of each correlation column and sets column widths.
+
+    The strongest shift's column is bolded and the bandwidth of shifts around it is
+    highlighted. Formats are returned instead of being added as conditional-format
+    rules, so the caller attaches them to the cells as it writes them; blank cells
+    stay unformatted, as with the former 'no_blanks' rules.
+
+    column_shifts, if given, is the shift number of each column of df (as returned by
+    _column_shifts) and saves re-parsing names the caller has already parsed.
+    numeric_cols, if given, names the numeric columns and skips the dtype scan.
+    bold_highlight_format is used where the bold column falls inside the band.
+
+    Returns:
+        list: One format (or None) per column of df, or None if formatting was skipped.
+    """
     if df.empty:
-        return
+        return None
 
     # Determine the strongest shift based on the absolute value of the last row's correlation
     # Ensure we only consider numeric columns for idxmax
-    numeric_cols = df.select_dtypes(include=np.number)
+    if numeric_cols is None:
+        numeric_cols = df.select_dtypes(include=np.number).columns
     if numeric_cols.empty:
         print("  - Warning: No numeric columns found to determine strongest shift. Skipping formatting.")
-        return
-    last_row_corr = numeric_cols.iloc[-1].abs()
-    if last_row_corr.empty:
+        return None
+    last_row_corr = df.iloc[-1][numeric_cols].to_numpy(dtype=np.float64)
+    if last_row_corr.size == 0 or np.isnan(last_row_corr).all():
         print("  - Warning: Last row is empty or non-numeric. Skipping formatting.")
-        return
-    strongest_shift_col_name = last_row_corr.idxmax()
-
-    # Extract the base prefix (e.g., 'Shift' or 'CumCorr') and the shift value
-    col_prefix = ""
-    strongest_shift_S = None
-    try:
-        parts = strongest_shift_col_name.split('_Shift_')
-        if len(parts) == 2:
-            # Case: 'Prefix_Shift_X'
-            col_prefix = parts[0]
-            strongest_shift_S = int(parts[1])
-        elif len(parts) == 1 and strongest_shift_col_name.startswith('Shift_'):
-            # Case: 'Shift_X'
-            col_prefix = "Shift" # Use a standard prefix internally
-            strongest_shift_S = int(strongest_shift_col_name.split('_')[-1])
-        else:
-             raise ValueError("Unrecognized column name format")
-    except (ValueError, IndexError):
-        print(f"  - Warning: Could not parse prefix/shift from column '{strongest_shift_col_name}'. Skipping formatting.")
-        return # Cannot proceed without prefix and shift
+        return None
+    strongest_shift_col_name = numeric_cols[int(np.nanargmax(np.abs(last_row_corr)))]
 
     # Find the Excel column index for this shift (1-based)
     try:
@@ -46,24 +114,24 @@ def _apply_correlation_formatting(worksheet, df, max_shift, bold_format, highlig
         col_idx_excel = col_idx_df + 1 # +1 because Excel columns are 1-indexed
     except KeyError:
         print(f"  - Warning: Strongest shift column '{strongest_shift_col_name}' not found in DataFrame index. Skipping formatting.")
-        return
+        return None
 
-    max_row = len(df) # Number of data rows
+    # Shift number of every column, parsed once; the bandwidth lookup below reuses it
+    if column_shifts is None:
+        column_shifts = _column_shifts(df.columns)
+    if np.isnan(column_shifts[col_idx_df]):
+        print(f"  - Warning: Could not parse prefix/shift from column '{strongest_shift_col_name}'. Skipping formatting.")
+        return None # Cannot proceed without prefix and shift
+    strongest_shift_S = int(column_shifts[col_idx_df])
+
+    column_formats = [None] * len(df.columns)
 
     # --- Apply Bolding --- ##
+    # Adjust width slightly for the strongest column (bolded or not)
+    worksheet.set_column(col_idx_excel, col_idx_excel, width=12)
     if apply_bolding:
-        # Use conditional format to apply bold to data cells
-        worksheet.conditional_format(1, col_idx_excel, max_row, col_idx_excel,
-                                     {'type': 'no_blanks', # Apply to all non-blank cells
-                                      'format': bold_format})
-        # Optionally make header bold too (apply format directly)
-        # worksheet.write(0, col_idx_excel, df.columns[col_idx_df], bold_format) # Requires getting header string
-        # Adjust width slightly for bolded column
-        worksheet.set_column(col_idx_excel, col_idx_excel, width=12)
-        print(f"  - Applied bold format condition to column {col_idx_excel} ('{strongest_shift_col_name}').")
-    else:
-        # Ensure default width if not bolding
-        worksheet.set_column(col_idx_excel, col_idx_excel, width=12) # Adjust if needed
+        column_formats[col_idx_df] = bold_format
+        print(f"  - Applied bold format to column {col_idx_excel} ('{strongest_shift_col_name}').")
 
     # --- Apply Bandwidth Highlighting --- ##
     if apply_highlighting:
@@ -75,34 +143,155 @@ def _apply_correlation_formatting(worksheet, df, max_shift, bold_format, highlig
         start_shift = strongest_shift_S - radius
         end_shift = strongest_shift_S + radius
 
-        col_idx_excel_start = None
-        col_idx_excel_end = None
-        for shift_val in range(start_shift, end_shift + 1):
-            # *** FIX: Construct name using the *correct* prefix ***
-            # Handle cases where prefix might be empty (e.g. for 'Shift_X') or present ('CumCorr_Shift_X')
-            if col_prefix == "Shift": # Special handling for the base 'Shift_X' case
-                target_col_name = f"Shift_{shift_val}"
-            else:
-                target_col_name = f"{col_prefix}_Shift_{shift_val}"
-            if target_col_name in df.columns:
-                try:
-                    target_col_idx_df = df.columns.get_loc(target_col_name)
-                    target_col_idx_excel = target_col_idx_df + 1
-                    if col_idx_excel_start is None:
-                        col_idx_excel_start = target_col_idx_excel
-                    col_idx_excel_end = target_col_idx_excel # Always update end index
-                except KeyError:
-                    pass
-            #else:
-                #print(f"      DEBUG: Column {target_col_name} not found in DataFrame.")
-
-        if col_idx_excel_start is not None and col_idx_excel_end is not None:
-            worksheet.conditional_format(1, col_idx_excel_start, max_row, col_idx_excel_end,
-                                         {'type': 'no_blanks', 'format': highlight_format})
-            print(f"  - Applied highlight formatting condition for shifts {start_shift} to {end_shift}.")
+        # All columns inside the band in one comparison; NaN (unparsed) names never match
+        band_cols_df = np.flatnonzero((column_shifts >= start_shift) & (column_shifts <= end_shift))
+
+        if band_cols_df.size:
+            for j in band_cols_df.tolist():
+                if column_formats[j] is bold_format:
+                    column_formats[j] = bold_highlight_format or bold_format
+                else:
+                    column_formats[j] = highlight_format
+            print(f"  - Applied highlight formatting for shifts {start_shift} to {end_shift}.")
         else:
             print(f"  - Warning: Could not find columns for entire highlight range {start_shift} to {end_shift}. Skipping highlight.")
 
+    return column_formats
+
+def _build_result_tables(df_original, best_shift, rolling_corr_df, cumulative_corr_df, leading_col_name, target_col_name, window):
+    """
+    Builds the tables shared by every export format from the correlation results.
+
+    Args:
+        df_original (pd.DataFrame): Original DataFrame with 'Leading', 'Target' columns and DatetimeIndex.
+        best_shift (int): The optimal shift period found.
+        rolling_corr_df (pd.DataFrame or None): Rolling correlations per shift; None skips them.
+        cumulative_corr_df (pd.DataFrame or None): Cumulative correlations per shift; None skips them.
+        leading_col_name (str): Original name of the leading column.
+        target_col_name (str): Original name of the target column.
+        window (int): Rolling correlation window size.
+
+    Returns:
+        dict: 'optimal_df' (Optimal Shift Data, or None), 'r2_results_df' (R2 Results) and
+              'final_rolling_shifts' / 'final_cumulative_shifts' (shift number per column).
+    """
+    # Each correlation frame is optional (rolling is None for window <= 1); a missing one
+    # contributes no best-shift column and no R2 column
+    has_rolling = rolling_corr_df is not None and not rolling_corr_df.empty
+    has_cumulative = cumulative_corr_df is not None and not cumulative_corr_df.empty
+
+    # Final-row correlations and the shift number of each column, parsed once for all sheets
+    final_rolling_corr = rolling_corr_df.iloc[-1] if has_rolling else pd.Series(dtype=float)
+    final_cumulative_corr = cumulative_corr_df.iloc[-1] if has_cumulative else pd.Series(dtype=float)
+    final_rolling_shifts = _column_shifts(final_rolling_corr.index).astype(np.int64)
+    final_cumulative_shifts = _column_shifts(final_cumulative_corr.index).astype(np.int64)
+
+    # Prepare data for the 'Optimal Shift Data' sheet
+    optimal_df = None
+    shifted_columns = [] # (column name, best shift or None) per available correlation frame
+    if df_original is not None and best_shift is not None:
+        # Find best rolling and cumulative shifts (position of the max final correlation)
+        # (None when the final row has no correlation to compare; that column stays NaN)
+        if has_rolling:
+            best_rolling_shift = _best_final_shift(final_rolling_corr, final_rolling_shifts, 'rolling')
+            rolling_label = 'NA' if best_rolling_shift is None else f'{best_rolling_shift}p'
+            shifted_columns.append((f'{leading_col_name}_Shifted_Roll_{window}p_{rolling_label}', best_rolling_shift))
+        if has_cumulative:
+            best_cumulative_shift = _best_final_shift(final_cumulative_corr, final_cumulative_shifts, 'cumulative')
+            cumulative_label = 'NA' if best_cumulative_shift is None else f'{best_cumulative_shift}p'
+            shifted_columns.append((f'{leading_col_name}_Shifted_Cumul_{cumulative_label}', best_cumulative_shift))
+
+        # Fill one block: target, then the leading series at each best shift
+        leading = df_original['Leading'].to_numpy(dtype=float)
+        n = leading.size
+        optimal_values = np.full((n, 1 + len(shifted_columns)), np.nan)
+        optimal_values[:, 0] = df_original['Target'].to_numpy(dtype=float)
+        for j, (_, shift) in enumerate(shifted_columns, start=1):
+            if shift is None:
+                continue
+            k = min(abs(shift), n)
+            if shift >= 0:
+                optimal_values[k:, j] = leading[:n - k]
+            else:
+                optimal_values[:n - k, j] = leading[k:]
+
+        # Keep original column names for clarity in Excel
+        optimal_df = pd.DataFrame(optimal_values, index=df_original.index,
+                                  columns=[target_col_name] + [name for name, _ in shifted_columns])
+        optimal_df.index.name = 'Date' # Name the index column
+    else:
+        print("Warning: Cannot create Optimal Shift Data sheet (missing input).")
+
+    # --- Add extra row for positive shifts ---
+    # Determine the maximum positive shift between rolling and cumulative
+    max_positive_shift = max((shift for _, shift in shifted_columns if shift is not None), default=0)
+
+    if optimal_df is not None and max_positive_shift > 0 and not df_original.empty:
+        try:
+            # Find the last valid original leading value needed based on the max shift
+            # We need the value from 'max_positive_shift' periods ago to appear in the last row.
+            # The value at df_original.iloc[-1] corresponds to shift 0 in the last output row.
+            # The value at df_original.iloc[-max_positive_shift] will be shifted forward to the last date.
+            # To fill the *next* date, we need the value from df_original.iloc[-1 - (max_positive_shift-1)]? No, simpler:
+            # The value needed for the *next* row (Shift N) is the original value from the *current* last date (df_original.iloc[-1]).
+
+            last_date = optimal_df.index[-1] # Use optimal_df index now
+            # Calculate the next date based on the frequency of the index
+            if pd.api.types.is_datetime64_any_dtype(optimal_df.index):
+                # Use the index's own frequency when it carries one; otherwise infer it from the
+                # recent dates only (enough to extrapolate one period without scanning the whole
+                # history), default to MonthBegin if fails
+                freq = optimal_df.index.freqstr
+                if freq is None:
+                    recent_dates = optimal_df.index[-_FREQ_INFERENCE_TAIL:]
+                    freq = pd.infer_freq(recent_dates) if len(recent_dates) >= 3 else None
+                if freq is None:
+                    freq = pd.offsets.MonthBegin(1) # Assume monthly if cannot infer
+                    print(f"  - Warning: Could not infer date frequency, assuming monthly ('{freq.name}').")
+                else:
+                     print(f"  - Inferred date frequency: {freq}")
+                next_date = last_date + pd.tseries.frequencies.to_offset(freq)
+            else:
+                print("  - Warning: Index is not datetime, cannot calculate next date for extra row.")
+                next_date = None
+
+            if next_date is not None:
+                # Extend the index by one date; every column of the new row starts out NaN
+                optimal_df = optimal_df.reindex(optimal_df.index.append(pd.DatetimeIndex([next_date], name='Date')))
+                for j, (_, shift) in enumerate(shifted_columns, start=1):
+                    if shift is not None and shift > 0:
+                        # Value for next date (shift N) is the original value N-1 periods before the last date
+                        optimal_df.iloc[-1, j] = leading[-shift]
+                print(f"  - Added extra row for {next_date.strftime('%Y-%m-%d')} due to positive shift.")
+        except Exception as e:
+            print(f"Warning: Could not add extra shifted row - {e}")
+    # --- End extra row addition ---
+
+    # Square the final correlations once (NaN stays NaN) and key them by shift number
+    final_roll_r2 = pd.Series(np.square(final_rolling_corr.to_numpy(dtype=np.float64)), index=final_rolling_shifts)
+    final_cumul_r2 = pd.Series(np.square(final_cumulative_corr.to_numpy(dtype=np.float64)), index=final_cumulative_shifts)
+
+    # Determine the set of all shifts tested (union is sorted)
+    all_shifts = final_roll_r2.index.union(final_cumul_r2.index)
+
+    # Create initial DataFrame with just shifts
+    r2_results_df = pd.DataFrame({'Shift': all_shifts})
+
+    # Add R2 columns aligned on the shared shifts; reindex is copy-free when they already match
+    rolling_r2_col_name = f'R2 (Final Rolling - {window}p)'
+    cumulative_r2_col_name = 'R2 (Final Cumulative)'
+    if has_rolling:
+        r2_results_df[rolling_r2_col_name] = final_roll_r2.reindex(all_shifts).to_numpy()
+    if has_cumulative:
+        r2_results_df[cumulative_r2_col_name] = final_cumul_r2.reindex(all_shifts).to_numpy()
+
+    return {
+        'optimal_df': optimal_df,
+        'r2_results_df': r2_results_df,
+        'final_rolling_shifts': final_rolling_shifts,
+        'final_cumulative_shifts': final_cumulative_shifts,
+    }
+
 def export_to_excel(df_original, best_shift, rolling_corr_df, cumulative_corr_df, output_dir, leading_col_name, target_col_name, max_shift, window):
     """
     Exports the analysis results to an Excel file with multiple sheets.
@@ -110,8 +299,8 @@ def export_to_excel(df_original, best_shift, rolling_corr_df, cumulative_corr_df
     Args:
         df_original (pd.DataFrame): Original DataFrame with 'Leading', 'Target' columns and DatetimeIndex.
         best_shift (int): The optimal shift period found.
-        rolling_corr_df (pd.DataFrame): DataFrame with rolling correlations per shift.
-        cumulative_corr_df (pd.DataFrame): DataFrame with cumulative correlations per shift.
+        rolling_corr_df (pd.DataFrame or None): Rolling correlations per shift; None skips them.
+        cumulative_corr_df (pd.DataFrame or None): Cumulative correlations per shift; None skips them.
         output_dir (str): Directory to save the Excel file.
         leading_col_name (str): Original name of the leading column.
         target_col_name (str): Original name of the target column.
@@ -124,129 +313,51 @@ def export_to_excel(df_original, best_shift, rolling_corr_df, cumulative_corr_df
         output_dir = 'results'
     output_filename = os.path.join(output_dir, 'analysis_results.xlsx')
 
+    # Every sheet is derived from the correlation results; without them there is nothing
+    # to write, so skip creating (and zipping up) an empty workbook
+    if all(corr_df is None or corr_df.empty for corr_df in (rolling_corr_df, cumulative_corr_df)):
+        print("Warning: No correlation results to export. Skipping Excel export.")
+        return
+
     try:
         # Ensure output directory exists
         os.makedirs(output_dir, exist_ok=True)
 
-        # Prepare data for the 'Optimal Shift Data' sheet
-        optimal_df = None
-        if df_original is not None and best_shift is not None:
-            # Find best rolling shift
-            last_rolling_corr = rolling_corr_df.iloc[-1] if not rolling_corr_df.empty else pd.Series(dtype=float)
-            best_rolling_col = last_rolling_corr.idxmax()
-            best_rolling_shift = int(best_rolling_col.split('_')[-1])
-
-            # Find best cumulative shift
-            last_cumulative_corr = cumulative_corr_df.iloc[-1] if not cumulative_corr_df.empty else pd.Series(dtype=float)
-            best_cumulative_col = last_cumulative_corr.idxmax()
-            best_cumulative_shift = int(best_cumulative_col.split('_')[-1])
-
-            optimal_df = pd.DataFrame({
-                # Keep original column names for clarity in Excel
-                target_col_name: df_original['Target'],
-                f'{leading_col_name}_Shifted_Roll_{window}p_{best_rolling_shift}p': df_original['Leading'].shift(best_rolling_shift),
-                f'{leading_col_name}_Shifted_Cumul_{best_cumulative_shift}p': df_original['Leading'].shift(best_cumulative_shift)
-            })
-            optimal_df.index.name = 'Date' # Name the index column
-        else:
-            print("Warning: Cannot create Optimal Shift Data sheet (missing input).")
-
-        # --- Add extra row for positive shifts ---
-        # Determine the maximum positive shift between rolling and cumulative
-        max_positive_shift = max(best_rolling_shift if best_rolling_shift > 0 else 0, best_cumulative_shift if best_cumulative_shift > 0 else 0)
-
-        if optimal_df is not None and max_positive_shift > 0 and not df_original.empty:
-            try:
-                # Find the last valid original leading value needed based on the max shift
-                # We need the value from 'max_positive_shift' periods ago to appear in the last row.
-                # The value at df_original.iloc[-1] corresponds to shift 0 in the last output row.
-                # The value at df_original.iloc[-max_positive_shift] will be shifted forward to the last date.
-                # To fill the *next* date, we need the value from df_original.iloc[-1 - (max_positive_shift-1)]? No, simpler:
-                # The value needed for the *next* row (Shift N) is the original value from the *current* last date (df_original.iloc[-1]).
-
-                last_date = optimal_df.index[-1] # Use optimal_df index now
-                # Calculate the next date based on the frequency of the index
-                if pd.api.types.is_datetime64_any_dtype(optimal_df.index):
-                    # Attempt to infer frequency, default to MonthBegin if fails
-                    freq = pd.infer_freq(optimal_df.index)
-                    if freq is None:
-                        freq = pd.offsets.MonthBegin(1) # Assume monthly if cannot infer
-                        print(f"  - Warning: Could not infer date frequency, assuming monthly ('{freq.name}').")
-                    else:
-                         print(f"  - Inferred date frequency: {freq}")
-                    next_date = last_date + pd.tseries.frequencies.to_offset(freq)
-                else:
-                    print("  - Warning: Index is not datetime, cannot calculate next date for extra row.")
-                    next_date = None
-
-                if next_date is not None:
-                    # Prepare data for the new row
-                    new_row_data = {target_col_name: pd.NA}
-                    if best_rolling_shift > 0:
-                         roll_col_name = f'{leading_col_name}_Shifted_Roll_{window}p_{best_rolling_shift}p'
-                         # Value for next date (shift N) is the *last* original value
-                         new_row_data[roll_col_name] = df_original['Leading'].iloc[-1] if best_rolling_shift == 1 else df_original['Leading'].iloc[-best_rolling_shift] # Adjust source index for shift
-
-                    if best_cumulative_shift > 0:
-                        cumul_col_name = f'{leading_col_name}_Shifted_Cumul_{best_cumulative_shift}p'
-                         # Value for next date (shift N) is the *last* original value
-                        new_row_data[cumul_col_name] = df_original['Leading'].iloc[-1] if best_cumulative_shift == 1 else df_original['Leading'].iloc[-best_cumulative_shift] # Adjust source index for shift
-
-                    # Add columns that might be missing in new_row_data but exist in optimal_df
-                    for col in optimal_df.columns:
-                         if col not in new_row_data:
-                             new_row_data[col] = pd.NA
-
-                    new_row = pd.DataFrame(new_row_data, index=[next_date])
-                    new_row.index.name = 'Date' # Ensure index name matches
-
-                    optimal_df = pd.concat([optimal_df, new_row])
-                    print(f"  - Added extra row for {next_date.strftime('%Y-%m-%d')} due to positive shift.")
-            except Exception as e:
-                print(f"Warning: Could not add extra shifted row - {e}")
-        # --- End extra row addition ---
-
-        with pd.ExcelWriter(output_filename, engine='xlsxwriter', datetime_format='yyyy-mm-dd') as writer:
+        tables = _build_result_tables(df_original, best_shift, rolling_corr_df, cumulative_corr_df,
+                                      leading_col_name, target_col_name, window)
+        optimal_df = tables['optimal_df']
+        r2_results_df = tables['r2_results_df']
+        cumulative_r2_col_name = 'R2 (Final Cumulative)'
+
+        # Stream rows to disk as they are written so peak memory does not grow with the
+        # sheet size (in_memory would override this), and skip xlsxwriter's per-string
+        # URL/formula scans; the only strings written are header labels
+        writer_options = {'constant_memory': True, 'strings_to_numbers': False,
+                          'strings_to_formulas': False, 'strings_to_urls': False}
+        with pd.ExcelWriter(output_filename, engine='xlsxwriter', datetime_format='yyyy-mm-dd',
+                            engine_kwargs={'options': writer_options}) as writer:
             # Get workbook and define formats
             workbook = writer.book
             bold_format = workbook.add_format({'bold': True}) # Restore bold format
             highlight_format = workbook.add_format({'bg_color': '#E0E0E0'}) # Restore light grey background
+            bold_highlight_format = workbook.add_format({'bold': True, 'bg_color': '#E0E0E0'})
+            date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
 
             # --- 1. R2 Results Sheet --- ##
-            # Prepare data for R2 Results sheet enhancement
-            final_rolling_corr = rolling_corr_df.iloc[-1] if not rolling_corr_df.empty else pd.Series(dtype=float)
-            final_cumulative_corr = cumulative_corr_df.iloc[-1] if not cumulative_corr_df.empty else pd.Series(dtype=float)
-
-            # Create maps from shift number to final correlation value
-            final_roll_corr_map = { int(col.split('_')[-1]): val for col, val in final_rolling_corr.items() }
-            final_cumul_corr_map = { int(col.split('_')[-1]): val for col, val in final_cumulative_corr.items() }
-
-            # Determine the set of all shifts tested from the maps
-            all_shifts = sorted(list(set(final_roll_corr_map.keys()) | set(final_cumul_corr_map.keys())))
-
-            # Create initial DataFrame with just shifts
-            r2_results_df = pd.DataFrame({'Shift': all_shifts})
-
-            # Add new R2 columns using the maps, squaring the correlation values
-            rolling_r2_col_name = f'R2 (Final Rolling - {window}p)'
-            cumulative_r2_col_name = 'R2 (Final Cumulative)'
-            r2_results_df[rolling_r2_col_name] = r2_results_df['Shift'].map(final_roll_corr_map).apply(lambda x: x**2 if pd.notna(x) else np.nan)
-            r2_results_df[cumulative_r2_col_name] = r2_results_df['Shift'].map(final_cumul_corr_map).apply(lambda x: x**2 if pd.notna(x) else np.nan)
-
-            # Write the enhanced DataFrame to Excel
-            r2_results_df.to_excel(writer, sheet_name='R2 Results', index=False)
-            worksheet_r2 = writer.sheets['R2 Results']
+            worksheet_r2 = workbook.add_worksheet('R2 Results')
 
             # Find the row number for the shift with the highest FINAL CUMULATIVE R2
+            # (row formats must be set before the row is written in constant_memory mode)
             try:
                 if not r2_results_df.empty and cumulative_r2_col_name in r2_results_df:
-                     # Ensure the column exists and is not all NaN before finding idxmax
-                    if r2_results_df[cumulative_r2_col_name].notna().any():
-                        best_cumul_r2_idx = r2_results_df[cumulative_r2_col_name].idxmax()
-                        best_cumul_shift_val = r2_results_df.loc[best_cumul_r2_idx, 'Shift']
-                        # Find the row index in the DataFrame where 'Shift' matches best_cumul_shift_val
+                    cumulative_r2 = r2_results_df[cumulative_r2_col_name].to_numpy(dtype=np.float64)
+                    # Ensure the column is not all NaN before finding the max
+                    if not np.isnan(cumulative_r2).all():
+                        # Shifts are unique, so the position of the max is the row to bold
+                        best_cumul_r2_pos = int(np.nanargmax(cumulative_r2))
+                        best_cumul_shift_val = r2_results_df['Shift'].iat[best_cumul_r2_pos]
                         # Add 1 for header row, and 1 because Excel is 1-based
-                        target_row_excel = r2_results_df[r2_results_df['Shift'] == best_cumul_shift_val].index[0] + 2
+                        target_row_excel = best_cumul_r2_pos + 2
                         # Apply bold format to that specific row
                         worksheet_r2.set_row(target_row_excel - 1, cell_format=bold_format)
                         print(f"  - Applied bold format to R2 Results row {target_row_excel} (Shift {best_cumul_shift_val} based on max Final Cumulative R2).")
@@ -257,20 +368,23 @@ def export_to_excel(df_original, best_shift, rolling_corr_df, cumulative_corr_df
             except Exception as e:
                 print(f"  - Warning: Error applying bold format to R2 Results sheet - {e}")
 
+            # Write the enhanced DataFrame to Excel
+            _write_frame(worksheet_r2, r2_results_df, date_format, index=False)
+
             # --- 2. Optimal Shift Data Sheet --- ##
             if optimal_df is not None:
-                optimal_df.to_excel(writer, sheet_name='Optimal Shift Data', index=True)
-                worksheet_opt = writer.sheets['Optimal Shift Data']
+                worksheet_opt = workbook.add_worksheet('Optimal Shift Data')
                 # Set column widths for Optimal Shift Data sheet
                 worksheet_opt.set_column(0, 0, 12) # Date column
                 worksheet_opt.set_column(1, optimal_df.shape[1], 15) # Other data columns
+                _write_frame(worksheet_opt, optimal_df, date_format)
                 print("  - Optimal Shift Data sheet written.")
 
             # --- 3. Rolling Correlations Sheet --- ##
             if rolling_corr_df is not None and not rolling_corr_df.empty:
-                rolling_corr_df.to_excel(writer, sheet_name=f'Rolling Corrs ({window}p)', index=True)
-                worksheet_roll = writer.sheets[f'Rolling Corrs ({window}p)']
-                _apply_correlation_formatting(worksheet_roll, rolling_corr_df, max_shift, bold_format, highlight_format, workbook, apply_bolding=True, apply_highlighting=True)
+                worksheet_roll = workbook.add_worksheet(f'Rolling Corrs ({window}p)')
+                roll_formats = _apply_correlation_formatting(worksheet_roll, rolling_corr_df, max_shift, bold_format, highlight_format, apply_bolding=True, apply_highlighting=True, column_shifts=tables['final_rolling_shifts'], numeric_cols=rolling_corr_df.columns, bold_highlight_format=bold_highlight_format)
+                _write_frame(worksheet_roll, rolling_corr_df, date_format, column_formats=roll_formats)
                 # Set Date column width
                 worksheet_roll.set_column(0, 0, 12)
                 print(f"  - Wrote 'Rolling Corrs ({window}p)' sheet.")
@@ -279,9 +393,9 @@ def export_to_excel(df_original, best_shift, rolling_corr_df, cumulative_corr_df
 
             # --- 4. Cumulative Correlations Sheet --- ##
             if cumulative_corr_df is not None and not cumulative_corr_df.empty:
-                cumulative_corr_df.to_excel(writer, sheet_name='Cumulative Corrs', index=True)
-                worksheet_cumul = writer.sheets['Cumulative Corrs']
-                _apply_correlation_formatting(worksheet_cumul, cumulative_corr_df, max_shift, bold_format, highlight_format, workbook, apply_bolding=True, apply_highlighting=True)
+                worksheet_cumul = workbook.add_worksheet('Cumulative Corrs')
+                cumul_formats = _apply_correlation_formatting(worksheet_cumul, cumulative_corr_df, max_shift, bold_format, highlight_format, apply_bolding=True, apply_highlighting=True, column_shifts=tables['final_cumulative_shifts'], numeric_cols=cumulative_corr_df.columns, bold_highlight_format=bold_highlight_format)
+                _write_frame(worksheet_cumul, cumulative_corr_df, date_format, column_formats=cumul_formats)
                 # Set Date column width
                 worksheet_cumul.set_column(0, 0, 12)
                 print("  - Wrote 'Cumulative Corrs' sheet.")
@@ -292,3 +406,55 @@ def export_to_excel(df_original, best_shift, rolling_corr_df, cumulative_corr_df
 
     except Exception as e:
         print(f"Error exporting results to Excel: {e}")
+
+def export_to_parquet(df_original, best_shift, rolling_corr_df, cumulative_corr_df, output_dir, leading_col_name, target_col_name, window):
+    """
+    Exports the same tables as export_to_excel, one Parquet file per sheet and without
+    Excel formatting. Much faster than building a workbook; requires pyarrow.
+
+    Args:
+        df_original (pd.DataFrame): Original DataFrame with 'Leading', 'Target' columns and DatetimeIndex.
+        best_shift (int): The optimal shift period found.
+        rolling_corr_df (pd.DataFrame or None): Rolling correlations per shift; None skips them.
+        cumulative_corr_df (pd.DataFrame or None): Cumulative correlations per shift; None skips them.
+        output_dir (str): Directory to save the Parquet files.
+        leading_col_name (str): Original name of the leading column.
+        target_col_name (str): Original name of the target column.
+        window (int): Rolling correlation window size.
+    """
+    print(f"\n--- Exporting Results (Step 8) ---")
+    if not output_dir:
+        output_dir = 'results'
+
+    if all(corr_df is None or corr_df.empty for corr_df in (rolling_corr_df, cumulative_corr_df)):
+        print("Warning: No correlation results to export. Skipping Parquet export.")
+        return
+
+    if not _HAS_PYARROW:
+        print("Error: Parquet export requires pyarrow (pip install pyarrow).")
+        return
+
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        tables = _build_result_tables(df_original, best_shift, rolling_corr_df, cumulative_corr_df,
+                                      leading_col_name, target_col_name, window)
+
+        # (file name, frame, keep index) -- mirrors the workbook's sheets
+        outputs = [
+            ('r2_results', tables['r2_results_df'], False),
+            ('optimal_shift_data', tables['optimal_df'], True),
+            (f'rolling_corrs_{window}p', rolling_corr_df, True),
+            ('cumulative_corrs', cumulative_corr_df, True),
+        ]
+        for name, df, keep_index in outputs:
+            if df is None or df.empty:
+                print(f"  - Skipping {name} (no data).")
+                continue
+            output_filename = os.path.join(output_dir, f'{name}.parquet')
+            df.to_parquet(output_filename, index=keep_index, compression='zstd')
+            print(f"  - Wrote {output_filename}")
+
+        print(f"Results successfully exported to {output_dir}")
+
+    except Exception as e:
+        print(f"Error exporting results to Parquet: {e}")
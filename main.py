@@ -1,16 +1,15 @@
 import argparse
 import os
-import pandas as pd
 import sys
+from datetime import datetime
 
 # Add project root to the Python path
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, project_root)
 
-from data_loader import load_data
-from analysis import find_optimal_lead_lag, calculate_rolling_correlations, calculate_cumulative_correlations
-from plotting import plot_scatter, plot_optimal_lead, plot_rolling_correlations
-from export import export_to_excel
+# pandas, numba and matplotlib take most of a second to import, so the project modules
+# are imported inside main() where they are first needed; --help and argument errors
+# return without loading them
 
 def main():
     parser = argparse.ArgumentParser(
@@ -41,6 +40,12 @@ def main():
                         help="Name or index (0-indexed) of the sheet to read")
     parser.add_argument("--output_dir", default="results", 
                         help="Directory to save results")
+    parser.add_argument("--export-format", choices=["xlsx", "parquet"], default="xlsx",
+                        help="Output format for the result tables; parquet skips Excel formatting and needs pyarrow")
+    parser.add_argument("--date-format", default=None,
+                        help="Explicit format of the date column (e.g. %%m/%%y); inferred if omitted")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always re-read the Excel file instead of using the Parquet cache saved next to it (cache needs pyarrow)")
 
     # --- Optional Data Exclusion ---
     parser.add_argument(
@@ -109,8 +114,8 @@ def main():
                 
                 # Validate dates
                 try:
-                    start_date = pd.to_datetime(start_str, format='%Y-%m-%d', errors='raise')
-                    end_date = pd.to_datetime(end_str, format='%Y-%m-%d', errors='raise')
+                    start_date = datetime.strptime(start_str, '%Y-%m-%d')
+                    end_date = datetime.strptime(end_str, '%Y-%m-%d')
                     
                     if start_date > end_date:
                         print(f"  Error: Start date {start_str} cannot be after end date {end_str}. Please re-enter.")
@@ -143,29 +148,22 @@ def main():
         print(f"Exclude Periods: {', '.join(exclusion_periods_to_use)}")
     print("-" * 38)
 
-    # Create output directory if it doesn't exist
-    if not os.path.exists(args.output_dir):
-        try:
-            os.makedirs(args.output_dir)
-            print(f"Created output directory: {args.output_dir}")
-        except OSError as e:
-            print(f"Error creating output directory {args.output_dir}: {e}")
-            return
+    # Create output directory if it doesn't exist (single call, no separate exists() stat)
+    try:
+        os.makedirs(args.output_dir, exist_ok=True)
+    except OSError as e:
+        print(f"Error creating output directory {args.output_dir}: {e}")
+        return
 
+    # The parameters were summarized above; just mark where the work starts
     print("--- Starting Analysis ---")
-    print(f"File: {args.file_path}")
-    print(f"Sheet: {args.sheet}") # Print sheet name/index
-    print(f"Columns: Date='{args.date_col}', Leading='{args.leading_col}', Target='{args.target_col}'")
-    print(f"Header Row Index: {args.header}")
-    print(f"Output Directory: {args.output_dir}")
-    if exclusion_periods_to_use: # Use the determined list
-        print(f"Exclude Periods: {', '.join(exclusion_periods_to_use)}")
-    print("-" * 25)
 
     # --- Step 2: Load Data ---
     print("Loading data...")
+    from data_loader import load_data, load_data_cached, build_exclusion_mask
     # Load into df_original
-    df_original = load_data(args.file_path, args.date_col, args.leading_col, args.target_col, args.header, args.sheet)
+    loader = load_data if args.no_cache else load_data_cached
+    df_original = loader(args.file_path, args.date_col, args.leading_col, args.target_col, args.header, args.sheet, args.date_format)
 
     # if df is None:
     if df_original is None:
@@ -174,62 +172,44 @@ def main():
 
     # --- Step 2.5: Apply Date Exclusions (if any) ---
     # Filter the DataFrame based on user-provided exclusion periods (CLI or interactive).
-    exclusion_mask = pd.Series(False, index=df_original.index) # Initialize mask for original df
     applied_exclusions = False # Flag to check if any exclusions were actually applied
     if exclusion_periods_to_use: # Check if the list (either from CLI or interactive) is not empty
         print("Parsing date exclusions...")
         # original_rows = len(df)
         original_rows = len(df_original)
-        # Start with a mask where nothing is excluded
-        # exclusion_mask = pd.Series(False, index=df.index) # Moved up
-
-        for period_str in exclusion_periods_to_use: # Use the determined list
-            try:
-                start_str, end_str = period_str.split(':')
-                # Use errors='coerce' here for robustness, already validated if interactive
-                start_date = pd.to_datetime(start_str, errors='coerce') 
-                end_date = pd.to_datetime(end_str, errors='coerce')
-
-                # Check if dates parsed correctly and start <= end
-                if pd.isna(start_date) or pd.isna(end_date):
-                    print(f"  Warning: Could not parse dates in exclusion period '{period_str}'. Expected format YYYY-MM-DD. Skipping.")
-                    continue
-                if start_date > end_date:
-                    print(f"  Warning: Start date {start_str} is after end date {end_str} in exclusion period '{period_str}'. Skipping this period.")
-                    continue
 
-                # Update the mask: True for rows within this period
-                period_mask = (df_original.index >= start_date) & (df_original.index <= end_date)
-                exclusion_mask |= period_mask # Combine masks using OR
-                print(f"  Marked period {start_str} to {end_str} for exclusion.")
+        exclusion_mask = build_exclusion_mask(df_original.index, exclusion_periods_to_use)
 
-            except ValueError:
-                print(f"  Warning: Invalid format for exclusion period '{period_str}'. Expected START:END. Skipping.")
-        
         # Create df_filtered by applying the combined mask
-        df_filtered = df_original[~exclusion_mask].copy() # Use ~exclusion_mask to keep non-excluded rows
+        df_filtered = df_original[~exclusion_mask] # Boolean indexing already returns new data
         
         if len(df_filtered) < original_rows:
             applied_exclusions = True
             print(f"Data filtered. Original rows: {original_rows}, Filtered rows: {len(df_filtered)}")
         else:
             print("No rows were excluded based on the provided periods.")
-            df_filtered = df_original.copy() # Ensure df_filtered exists even if no rows were excluded
+            df_filtered = df_original # Nothing excluded; the analysis steps never modify their input
             
     else:
-        # If no exclusion periods provided, df_filtered is just a copy of df_original
-        df_filtered = df_original.copy()
+        # If no exclusion periods provided, df_filtered is just df_original (treated as read-only)
+        df_filtered = df_original
         print("No date exclusion periods specified.")
 
     # --- Step 3: Prepare Data for Analysis --- 
+    from analysis import prepare_lag_data, find_optimal_lead_lag, calculate_rolling_correlations, calculate_cumulative_correlations
     # Use df_filtered for lead/lag analysis
     if df_filtered is None or df_filtered.empty:
         print("Error: No data available for analysis after filtering. Exiting.")
         return
     
+    # Extract the series arrays once; the rolling and cumulative analyses (and the
+    # lead/lag search when nothing was excluded) all share them
+    lag_data_original = prepare_lag_data(df_original)
+    lag_data_filtered = prepare_lag_data(df_filtered) if applied_exclusions else lag_data_original
+
     # --- Step 4: Find Optimal Lead/Lag --- 
     # Pass the potentially filtered dataframe here
-    best_shift_filtered, r2_results_filtered = find_optimal_lead_lag(df_filtered, args.range)
+    best_shift_filtered, r2_results_filtered = find_optimal_lead_lag(df_filtered, args.range, lag_data=lag_data_filtered)
 
     if best_shift_filtered is None:
         print("Could not determine optimal shift from filtered data. Further analysis might be unreliable.")
@@ -241,17 +221,18 @@ def main():
 
     # --- Step 5: Generate Plots (based on filtered R2/shift, but plotting original data) ---
     print("\n--- Plotting Optimal Shift Results (Step 5) ---")
+    from plotting import plot_scatter, plot_optimal_lead, plot_rolling_correlations
     # Always plot using df_original, but use best_shift determined from df_filtered
     plot_scatter(df_original, best_shift, args.output_dir, args.leading_col, args.target_col)
     plot_optimal_lead(df_original, best_shift, args.output_dir, args.leading_col, args.target_col)
 
     # --- Step 6: Calculate Rolling Correlations --- 
     # Calculate rolling correlations on the ORIGINAL, unfiltered data
-    rolling_corr_df = calculate_rolling_correlations(df_original, args.range, args.window, args.leading_col, args.target_col)
+    rolling_corr_df = calculate_rolling_correlations(df_original, args.range, args.window, lag_data=lag_data_original)
 
     # --- Step 6.5: Calculate Cumulative Correlations --- 
     # Calculate cumulative correlations on the ORIGINAL, unfiltered data
-    cumulative_corr_df = calculate_cumulative_correlations(df_original, args.range, args.leading_col, args.target_col)
+    cumulative_corr_df = calculate_cumulative_correlations(df_original, args.range, lag_data=lag_data_original)
     
     # --- Step 7: Plot Rolling Correlations --- 
     # Plot rolling correlations (calculated from original data)
@@ -265,10 +246,16 @@ def main():
 
     # --- Step 8: Export Results to Excel --- 
     # Export using original data, but pass best_shift (from filtered), and correlation DFs (from original)
-    export_to_excel(df_original, best_shift, rolling_corr_df, cumulative_corr_df, args.output_dir, args.leading_col, args.target_col, args.range, args.window)
+    from export import export_to_excel, export_to_parquet
+    if args.export_format == 'parquet':
+        export_to_parquet(df_original, best_shift, rolling_corr_df, cumulative_corr_df, args.output_dir, args.leading_col, args.target_col, args.window)
+        results_location = args.output_dir
+    else:
+        export_to_excel(df_original, best_shift, rolling_corr_df, cumulative_corr_df, args.output_dir, args.leading_col, args.target_col, args.range, args.window)
+        results_location = os.path.join(args.output_dir, 'analysis_results.xlsx')
 
     print("\n--- Analysis Complete --- ")
-    print(f"Results exported to: {os.path.join(args.output_dir, 'analysis_results.xlsx')}")
+    print(f"Results exported to: {results_location}")
     print(f"Plots saved in: {args.output_dir}")
 
 if __name__ == "__main__":
@@ -1,8 +1,17 @@
 # plotting.py
-import matplotlib.pyplot as plt
+import matplotlib as mpl
+from matplotlib.figure import Figure
 import pandas as pd
 import os
 
+# Above this many points the scatter plot is drawn as a hexbin density plot
+_SCATTER_MAX_POINTS = 50000
+
+# Render settings for the line plots, applied only while saving so importers' rcParams
+# are untouched. The maximum simplify threshold merges vertices that fall within one
+# pixel of the line, which is indistinguishable at the saved resolution.
+_LINE_PLOT_RC = {'path.simplify_threshold': 1.0}
+
 def plot_scatter(df, best_shift, output_dir, leading_col_name, target_col_name):
     """
     Generates and saves a scatter plot of the target series vs. the optimally
@@ -26,18 +35,26 @@ def plot_scatter(df, best_shift, output_dir, leading_col_name, target_col_name):
             print("Warning: Cannot generate scatter plot. No overlapping data after shift.")
             return
 
-        plt.figure(figsize=(10, 6))
-        plt.scatter(temp_df[f'Shifted_Leading_{best_shift}p'], temp_df['Target'], alpha=0.5)
-        plt.title(f'Scatter Plot: {target_col_name} vs. {leading_col_name} (Shifted {best_shift} Periods)')
-        plt.xlabel(f'{leading_col_name} (Shifted {best_shift} Periods)')
-        plt.ylabel(target_col_name)
-        plt.grid(True)
+        # A standalone Figure (not pyplot) stays out of pyplot's global figure registry, so it needs no plt.close
+        fig = Figure(figsize=(10, 6))
+        ax = fig.subplots()
+        x, y = temp_df[f'Shifted_Leading_{best_shift}p'], temp_df['Target']
+        if len(temp_df) > _SCATTER_MAX_POINTS:
+            # Individual markers fully overplot at this density; bin them instead
+            hexes = ax.hexbin(x, y, gridsize=50, mincnt=1, cmap='viridis')
+            fig.colorbar(hexes, ax=ax, label='Points per bin')
+        else:
+            # No marker edge stroke: the edges add a second rasterization per point
+            ax.scatter(x, y, alpha=0.5, linewidths=0)
+        ax.set_title(f'Scatter Plot: {target_col_name} vs. {leading_col_name} (Shifted {best_shift} Periods)')
+        ax.set_xlabel(f'{leading_col_name} (Shifted {best_shift} Periods)')
+        ax.set_ylabel(target_col_name)
+        ax.grid(True)
 
         # Ensure output directory exists
         os.makedirs(output_dir, exist_ok=True)
         plot_filename = os.path.join(output_dir, f'scatter_plot_shift_{best_shift}.png')
-        plt.savefig(plot_filename)
-        plt.close() # Close the plot to free memory
+        fig.savefig(plot_filename)
         print(f"Scatter plot saved to {plot_filename}")
 
     except Exception as e:
@@ -59,21 +76,22 @@ def plot_optimal_lead(df, best_shift, output_dir, leading_col_name, target_col_n
     try:
         shifted_leading = df['Leading'].shift(best_shift)
 
-        plt.figure(figsize=(12, 6))
-        plt.plot(df.index, df['Target'], label=f'{target_col_name} (Target)')
-        plt.plot(df.index, shifted_leading, label=f'{leading_col_name} (Shifted {best_shift} Periods)', alpha=0.7)
+        fig = Figure(figsize=(12, 6))
+        ax = fig.subplots()
+        ax.plot(df.index, df['Target'], label=f'{target_col_name} (Target)')
+        ax.plot(df.index, shifted_leading, label=f'{leading_col_name} (Shifted {best_shift} Periods)', alpha=0.7)
 
-        plt.title(f'Time Series: {target_col_name} vs. Optimally Shifted {leading_col_name}')
-        plt.xlabel('Date')
-        plt.ylabel('Value')
-        plt.legend()
-        plt.grid(True)
+        ax.set_title(f'Time Series: {target_col_name} vs. Optimally Shifted {leading_col_name}')
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Value')
+        ax.legend()
+        ax.grid(True)
 
         # Ensure output directory exists
         os.makedirs(output_dir, exist_ok=True)
         plot_filename = os.path.join(output_dir, f'line_plot_optimal_shift_{best_shift}.png')
-        plt.savefig(plot_filename)
-        plt.close() # Close the plot to free memory
+        with mpl.rc_context(_LINE_PLOT_RC):
+            fig.savefig(plot_filename)
         print(f"Optimal lead line chart saved to {plot_filename}")
 
     except Exception as e:
@@ -98,26 +116,27 @@ def plot_rolling_correlations(rolling_corr_df, window, output_dir):
         return
 
     try:
-        plt.figure(figsize=(14, 7))
+        fig = Figure(figsize=(14, 7))
+        ax = fig.subplots()
 
         num_shifts = len(rolling_corr_df.columns)
         for col in rolling_corr_df.columns:
-            plt.plot(rolling_corr_df.index, rolling_corr_df[col], label=col, alpha=0.6)
+            ax.plot(rolling_corr_df.index, rolling_corr_df[col], label=col, alpha=0.6)
 
-        plt.title(f'{window}-Period Rolling Correlations Over Time') 
-        plt.xlabel('Date')
-        plt.ylabel('Rolling Correlation')
-        plt.grid(True)
+        ax.set_title(f'{window}-Period Rolling Correlations Over Time') 
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Rolling Correlation')
+        ax.grid(True)
 
         # Always display legend, even if crowded
-        plt.legend(title='Shift Period', bbox_to_anchor=(1.05, 1), loc='upper left')
+        ax.legend(title='Shift Period', bbox_to_anchor=(1.05, 1), loc='upper left')
 
         os.makedirs(output_dir, exist_ok=True)
         plot_filename = os.path.join(output_dir, 'rolling_correlations_evolution.png')
         # Adjust layout to prevent legend overlap
-        plt.tight_layout(rect=[0, 0, 0.85, 1]) 
-        plt.savefig(plot_filename)
-        plt.close()
+        fig.tight_layout(rect=[0, 0, 0.85, 1]) 
+        with mpl.rc_context(_LINE_PLOT_RC):
+            fig.savefig(plot_filename)
         print(f"Rolling correlation evolution plot saved to {plot_filename}")
 
     except Exception as e: